@@ -0,0 +1,335 @@
+// Celery3D GPU - Verilator Testbench for UART Command Parser
+// Streams a full cube frame at 921600 baud while the rasterizer model stalls,
+// and checks that every triangle arrives intact (no dropped bytes). Also
+// checks that a quantized triangle decodes to the same vertices as the full
+// format
+
+#include <verilated.h>
+#include <verilated_vcd_c.h>
+#include "Vcmd_parser.h"
+#include <cstdio>
+#include <cstdint>
+#include <cmath>
+#include <vector>
+
+// Command bytes (must match cmd_parser)
+#define CMD_CLEAR_FB     0x01
+#define CMD_CLEAR_DEPTH  0x02
+#define CMD_TRIANGLE     0x03
+#define CMD_TRIANGLE_Q   0x05
+
+// UART timing: 50 MHz clock, 921600 baud, 10 bits per byte (8N1)
+#define CLK_FREQ         50000000
+#define BAUD_RATE        921600
+#define BYTE_CYCLES      (CLK_FREQ / BAUD_RATE * 10)
+
+// Rasterizer model: busy time after each triangle / clear (in cycles).
+// Receiving a triangle takes 121 * BYTE_CYCLES (~65k cycles), so only a
+// triangle that rasterizes slower than that stalls the parser. The first
+// triangle of each frame models a screen-filling one on the DDR3 path
+// (~4096 pixels at ~30 cycles each), which stalls for ~100 UART bytes.
+#define TRI_BUSY_CYCLES       20000
+#define LONG_TRI_BUSY_CYCLES  120000
+#define CLEAR_BUSY_CYCLES     (64 * 64)
+
+// Test parameters
+#define NUM_TRIANGLES    12
+#define FIELDS_PER_TRI   30
+#define TRACE_DEPTH      99
+
+struct Triangle {
+    uint32_t fields[FIELDS_PER_TRI];  // x, y, z, w, u, v, r, g, b, a per vertex
+};
+
+// Simulation state
+static Vcmd_parser* dut;
+static VerilatedVcdC* trace = nullptr;
+static uint64_t sim_time = 0;
+
+static int tri_busy = 0;
+static int fb_busy = 0;
+static int depth_busy = 0;
+
+static std::vector<Triangle> received;
+static std::vector<uint16_t> clear_colors;
+static int depth_clears = 0;
+
+// Copy a vertex_t output into 10 fields (x is the most significant word)
+template <typename T>
+static void unpack_vertex(const T& v, uint32_t* fields) {
+    for (int f = 0; f < 10; f++) {
+        fields[f] = v[9 - f];
+    }
+}
+
+// Clock the DUT and model the rasterizer/clear handshakes
+static void tick() {
+    dut->tri_ready = (tri_busy == 0);
+    dut->fb_clearing = (fb_busy > 0);
+    dut->depth_clearing = (depth_busy > 0);
+
+    dut->clk = 0;
+    dut->eval();
+    if (trace) trace->dump(sim_time++);
+
+    dut->clk = 1;
+    dut->eval();
+    if (trace) trace->dump(sim_time++);
+
+    if (tri_busy > 0) tri_busy--;
+    if (fb_busy > 0) fb_busy--;
+    if (depth_busy > 0) depth_busy--;
+
+    if (dut->tri_valid) {
+        Triangle t;
+        unpack_vertex(dut->v0, &t.fields[0]);
+        unpack_vertex(dut->v1, &t.fields[10]);
+        unpack_vertex(dut->v2, &t.fields[20]);
+        tri_busy = (received.size() % NUM_TRIANGLES == 0) ? LONG_TRI_BUSY_CYCLES
+                                                          : TRI_BUSY_CYCLES;
+        received.push_back(t);
+    }
+    if (dut->fb_clear) {
+        clear_colors.push_back(dut->fb_clear_color);
+        fb_busy = CLEAR_BUSY_CYCLES;
+    }
+    if (dut->depth_clear) {
+        depth_clears++;
+        depth_busy = CLEAR_BUSY_CYCLES;
+    }
+}
+
+// Deliver bytes the way uart_rx does: a one-cycle valid pulse per byte,
+// spaced by the UART byte time
+static void send_bytes(const std::vector<uint8_t>& bytes) {
+    for (uint8_t b : bytes) {
+        dut->uart_data = b;
+        dut->uart_valid = 1;
+        tick();
+        dut->uart_valid = 0;
+        for (int i = 1; i < BYTE_CYCLES; i++) {
+            tick();
+        }
+    }
+}
+
+// Let the parser drain buffered bytes and finish outstanding work
+static void run_idle(int cycles) {
+    for (int i = 0; i < cycles; i++) {
+        tick();
+    }
+}
+
+static void push_u32(std::vector<uint8_t>& out, uint32_t v) {
+    out.push_back(v & 0xFF);
+    out.push_back((v >> 8) & 0xFF);
+    out.push_back((v >> 16) & 0xFF);
+    out.push_back((v >> 24) & 0xFF);
+}
+
+static void push_u16(std::vector<uint8_t>& out, uint16_t v) {
+    out.push_back(v & 0xFF);
+    out.push_back((v >> 8) & 0xFF);
+}
+
+// Float to S15.16, rounded like the host's to_fixed()
+static uint32_t to_fp(double v) {
+    return (uint32_t)(int32_t)lround(v * 65536.0);
+}
+
+// Distinct, recognizable field values (including negative S15.16 values)
+static Triangle make_triangle(int index) {
+    Triangle t;
+    for (int f = 0; f < FIELDS_PER_TRI; f++) {
+        uint32_t v = ((uint32_t)(index + 1) << 24) | ((uint32_t)f << 16) | (uint32_t)(index * 37 + f);
+        if (f % 3 == 0) v = ~v;
+        t.fields[f] = v;
+    }
+    return t;
+}
+
+static bool check_triangles(const std::vector<Triangle>& expected, size_t first) {
+    bool ok = true;
+    if (received.size() != first + expected.size()) {
+        printf("FAIL: expected %zu triangles, got %zu\n", expected.size(), received.size() - first);
+        return false;
+    }
+    for (size_t i = 0; i < expected.size(); i++) {
+        for (int f = 0; f < FIELDS_PER_TRI; f++) {
+            if (received[first + i].fields[f] != expected[i].fields[f]) {
+                printf("FAIL: triangle %zu field %d: expected 0x%08X got 0x%08X\n",
+                       i, f, expected[i].fields[f], received[first + i].fields[f]);
+                ok = false;
+            }
+        }
+    }
+    return ok;
+}
+
+// Test 1: a full cube frame (clear FB, clear depth, 12 triangles) sent
+// back-to-back at 921600 baud, with one long rasterizer stall
+static bool test_cube_frame() {
+    printf("Test 1: Cube frame at %d baud with rasterizer stalls...\n", BAUD_RATE);
+
+    const uint16_t bg_color = 0x18E7;
+    std::vector<Triangle> tris;
+    std::vector<uint8_t> stream;
+
+    stream.push_back(CMD_CLEAR_FB);
+    stream.push_back(bg_color & 0xFF);
+    stream.push_back(bg_color >> 8);
+    stream.push_back(CMD_CLEAR_DEPTH);
+
+    for (int i = 0; i < NUM_TRIANGLES; i++) {
+        Triangle t = make_triangle(i);
+        tris.push_back(t);
+        stream.push_back(CMD_TRIANGLE);
+        for (int f = 0; f < FIELDS_PER_TRI; f++) {
+            push_u32(stream, t.fields[f]);
+        }
+    }
+
+    size_t first = received.size();
+    send_bytes(stream);
+    run_idle(LONG_TRI_BUSY_CYCLES * 2);
+
+    bool ok = check_triangles(tris, first);
+    if (clear_colors.size() != 1 || clear_colors[0] != bg_color) {
+        printf("FAIL: framebuffer clear missing or wrong color\n");
+        ok = false;
+    }
+    if (depth_clears != 1) {
+        printf("FAIL: expected 1 depth clear, got %d\n", depth_clears);
+        ok = false;
+    }
+
+    printf("  %zu bytes, %zu triangles received: %s\n",
+           stream.size(), received.size() - first, ok ? "PASS" : "FAIL");
+    return ok;
+}
+
+// Test 2: the same triangle sent as CMD_TRIANGLE_Q and as CMD_TRIANGLE
+// must produce the same v0/v1/v2, within 1 LSB of S15.16. Values are
+// chosen to be exact in the quantized format (UV in 1/256 steps, colors
+// in 1/255 steps), as the host sends them for the cube.
+static bool test_quantized_triangle() {
+    printf("Test 2: Quantized triangle matches full triangle...\n");
+
+    // x, y, z, w, u, v per vertex; colors as 0-255
+    const double pos_uv[3][6] = {
+        {  12.5,  -7.25,  0.375, 1.0,   0.0,        1.0  },
+        { -63.75, 31.5,  -0.5,   2.5,  -1.5,        0.25 },
+        { 100.0, -48.125, 0.875, 0.75,  3.99609375, -2.0 },
+    };
+    const uint8_t rgba[3][4] = {
+        { 255,   0, 128, 255 },
+        { 204,  51,   1, 255 },
+        {  17, 254, 100,   0 },
+    };
+
+    std::vector<uint8_t> stream;
+    std::vector<uint32_t> full_fields;
+
+    stream.push_back(CMD_TRIANGLE_Q);
+    for (int i = 0; i < 3; i++) {
+        for (int f = 0; f < 4; f++) {
+            push_u32(stream, to_fp(pos_uv[i][f]));
+        }
+        for (int f = 4; f < 6; f++) {
+            push_u16(stream, (uint16_t)(int16_t)lround(pos_uv[i][f] * 256.0));
+        }
+        for (int c = 0; c < 4; c++) {
+            stream.push_back(rgba[i][c]);
+        }
+    }
+
+    stream.push_back(CMD_TRIANGLE);
+    for (int i = 0; i < 3; i++) {
+        for (int f = 0; f < 6; f++) {
+            full_fields.push_back(to_fp(pos_uv[i][f]));
+        }
+        for (int c = 0; c < 4; c++) {
+            full_fields.push_back(to_fp(rgba[i][c] / 255.0));
+        }
+    }
+    for (uint32_t v : full_fields) {
+        push_u32(stream, v);
+    }
+
+    size_t first = received.size();
+    send_bytes(stream);
+    run_idle(LONG_TRI_BUSY_CYCLES * 2);
+
+    if (received.size() != first + 2) {
+        printf("FAIL: expected 2 triangles, got %zu\n", received.size() - first);
+        return false;
+    }
+
+    bool ok = true;
+    const Triangle& q = received[first];
+    const Triangle& full = received[first + 1];
+    for (int f = 0; f < FIELDS_PER_TRI; f++) {
+        if (full.fields[f] != full_fields[f]) {
+            printf("FAIL: full triangle field %d: expected 0x%08X got 0x%08X\n",
+                   f, full_fields[f], full.fields[f]);
+            ok = false;
+        }
+        int64_t diff = (int64_t)(int32_t)q.fields[f] - (int64_t)(int32_t)full.fields[f];
+        if (diff < -1 || diff > 1) {
+            printf("FAIL: v%d field %d: quantized 0x%08X, full 0x%08X\n",
+                   f / 10, f % 10, q.fields[f], full.fields[f]);
+            ok = false;
+        }
+    }
+
+    printf("  v0/v1/v2 within 1 LSB: %s\n", ok ? "PASS" : "FAIL");
+    return ok;
+}
+
+int main(int argc, char** argv) {
+    Verilated::commandArgs(argc, argv);
+
+    // Create DUT
+    dut = new Vcmd_parser;
+
+    // Setup tracing (optional, the run is long: pass +trace)
+    const char* trace_arg = Verilated::commandArgsPlusMatch("trace");
+    if (trace_arg && trace_arg[0]) {
+        Verilated::traceEverOn(true);
+        trace = new VerilatedVcdC;
+        dut->trace(trace, TRACE_DEPTH);
+        trace->open("cmd_parser.vcd");
+    }
+
+    // Initialize inputs
+    dut->clk = 0;
+    dut->rst_n = 0;
+    dut->uart_data = 0;
+    dut->uart_valid = 0;
+
+    // Reset
+    run_idle(10);
+    dut->rst_n = 1;
+    run_idle(5);
+
+    printf("=== Command Parser Testbench ===\n\n");
+
+    int fail_count = 0;
+    if (!test_cube_frame()) fail_count++;
+    if (!test_quantized_triangle()) fail_count++;
+
+    // Cleanup
+    if (trace) {
+        trace->close();
+        delete trace;
+    }
+    delete dut;
+
+    if (fail_count > 0) {
+        printf("\n*** TEST FAILED ***\n");
+        return 1;
+    }
+
+    printf("\n*** ALL TESTS PASSED ***\n");
+    return 0;
+}
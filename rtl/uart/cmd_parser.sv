@@ -1,11 +1,14 @@
 // Celery3D GPU - UART Command Parser
 // Parses incoming UART bytes and translates to GPU commands
+// Bytes are buffered in an RX FIFO so none are dropped while waiting on the
+// rasterizer or a clear
 //
 // Command Protocol:
 //   0x01 + 2 bytes  -> Clear framebuffer (RGB565 little-endian)
 //   0x02            -> Clear depth buffer
 //   0x03 + 120 bytes -> Submit triangle (3 vertices × 40 bytes)
 //   0x04 + 1 byte   -> Set config flags
+//   0x05 + 72 bytes -> Submit quantized triangle (3 vertices × 24 bytes)
 //
 // Vertex format (40 bytes per vertex, little-endian fields):
 //   Bytes 0-3:   x (S15.16 fixed-point)
@@ -18,6 +21,16 @@
 //   Bytes 28-31: g
 //   Bytes 32-35: b
 //   Bytes 36-39: a
+//
+// Quantized vertex format (24 bytes per vertex, little-endian fields),
+// expanded to the full S15.16 vertex on receipt:
+//   Bytes 0-15:  x, y, z, w (S15.16 fixed-point, as above)
+//   Bytes 16-17: u (S7.8 fixed-point)
+//   Bytes 18-19: v (S7.8 fixed-point)
+//   Byte  20:    r (unsigned 0-255 = 0.0-1.0)
+//   Byte  21:    g
+//   Byte  22:    b
+//   Byte  23:    a
 
 module cmd_parser
     import celery_pkg::*;
@@ -57,10 +70,13 @@ module cmd_parser
     localparam CMD_CLEAR_DEPTH = 8'h02;
     localparam CMD_TRIANGLE    = 8'h03;
     localparam CMD_SET_CONFIG  = 8'h04;
+    localparam CMD_TRIANGLE_Q  = 8'h05;
 
     // Vertex size in bytes
     localparam VERTEX_BYTES = 40;
     localparam TRIANGLE_BYTES = VERTEX_BYTES * 3;  // 120 bytes
+    localparam QVERTEX_BYTES = 24;
+    localparam QTRIANGLE_BYTES = QVERTEX_BYTES * 3;  // 72 bytes
 
     // State machine
     typedef enum logic [3:0] {
@@ -72,7 +88,8 @@ module cmd_parser
         ST_RECV_TRIANGLE,   // Receive 120 bytes of vertex data
         ST_SUBMIT_TRI,      // Submit triangle to rasterizer
         ST_WAIT_TRI,        // Wait for triangle to complete
-        ST_RECV_CONFIG      // Receive config byte
+        ST_RECV_CONFIG,     // Receive config byte
+        ST_RECV_TRIANGLE_Q  // Receive 72 bytes of quantized vertex data
     } state_t;
 
     state_t state;
@@ -85,6 +102,18 @@ module cmd_parser
     logic [1:0]  field_byte;            // Current byte within 32-bit field (0-3)
     logic [4:0]  field_index;           // Current field (0-29)
 
+    // Quantized triangle receive position
+    logic [4:0]  qvtx_byte;             // Current byte within vertex (0-23)
+    logic [4:0]  qvtx_base;             // First field of current vertex (0, 10, 20)
+
+    // Expand 0-255 color to S15.16 0.0-1.0: c * 257 / 65536, with 255
+    // mapping to exactly 1.0
+    function automatic logic [31:0] unorm8_to_fp(input logic [7:0] c);
+        if (c == 8'hFF)
+            return 32'h0001_0000;
+        return {16'h0000, c, c};
+    endfunction
+
     // Build vertex from fields
     function automatic vertex_t build_vertex(input int base);
         vertex_t v;
@@ -101,6 +130,56 @@ module cmd_parser
         return v;
     endfunction
 
+    // =========================================================================
+    // RX Byte FIFO
+    // =========================================================================
+    // uart_rx has no flow control, and the state machine stops taking bytes
+    // while it waits on the rasterizer (ST_SUBMIT_TRI) or a clear. Buffer
+    // incoming bytes so none are lost during those stalls.
+    localparam RX_FIFO_DEPTH = 256;  // Power of 2; ~2 triangles of slack
+    localparam RX_ADDR_W = $clog2(RX_FIFO_DEPTH);
+
+    logic [7:0]         rx_fifo [0:RX_FIFO_DEPTH-1];
+    logic [RX_ADDR_W:0] rx_wr_ptr;  // Extra bit for full/empty
+    logic [RX_ADDR_W:0] rx_rd_ptr;
+    logic               rx_full;
+    logic               rx_valid;   // Byte available at FIFO head
+    logic [7:0]         rx_data;    // FIFO head byte
+    logic               rx_pop;     // State machine consumes the head byte
+
+    assign rx_full = (rx_wr_ptr[RX_ADDR_W] != rx_rd_ptr[RX_ADDR_W]) &&
+                     (rx_wr_ptr[RX_ADDR_W-1:0] == rx_rd_ptr[RX_ADDR_W-1:0]);
+    assign rx_valid = (rx_wr_ptr != rx_rd_ptr);
+    assign rx_data = rx_fifo[rx_rd_ptr[RX_ADDR_W-1:0]];
+
+    // Every state that waits on rx_valid consumes the byte it sees
+    assign rx_pop = rx_valid && (state == ST_IDLE ||
+                                 state == ST_CLEAR_FB_0 ||
+                                 state == ST_CLEAR_FB_1 ||
+                                 state == ST_RECV_TRIANGLE ||
+                                 state == ST_RECV_CONFIG ||
+                                 state == ST_RECV_TRIANGLE_Q);
+
+    always_ff @(posedge clk) begin
+        if (uart_valid && !rx_full) begin
+            rx_fifo[rx_wr_ptr[RX_ADDR_W-1:0]] <= uart_data;
+        end
+    end
+
+    always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+            rx_wr_ptr <= '0;
+            rx_rd_ptr <= '0;
+        end else begin
+            if (uart_valid && !rx_full) begin
+                rx_wr_ptr <= rx_wr_ptr + 1'b1;
+            end
+            if (rx_pop) begin
+                rx_rd_ptr <= rx_rd_ptr + 1'b1;
+            end
+        end
+    end
+
     // Main state machine
     always_ff @(posedge clk or negedge rst_n) begin
         if (!rst_n) begin
@@ -108,6 +187,8 @@ module cmd_parser
             byte_count <= '0;
             field_byte <= '0;
             field_index <= '0;
+            qvtx_byte <= '0;
+            qvtx_base <= '0;
             clear_color_reg <= '0;
             tri_valid <= 1'b0;
             fb_clear <= 1'b0;
@@ -135,8 +216,8 @@ module cmd_parser
 
             case (state)
                 ST_IDLE: begin
-                    if (uart_valid) begin
-                        case (uart_data)
+                    if (rx_valid) begin
+                        case (rx_data)
                             CMD_CLEAR_FB: begin
                                 state <= ST_CLEAR_FB_0;
                             end
@@ -156,6 +237,13 @@ module cmd_parser
                                 state <= ST_RECV_CONFIG;
                             end
 
+                            CMD_TRIANGLE_Q: begin
+                                state <= ST_RECV_TRIANGLE_Q;
+                                byte_count <= '0;
+                                qvtx_byte <= '0;
+                                qvtx_base <= '0;
+                            end
+
                             default: begin
                                 // Unknown command, ignore
                                 state <= ST_IDLE;
@@ -166,16 +254,16 @@ module cmd_parser
 
                 ST_CLEAR_FB_0: begin
                     // Receive low byte of RGB565 color
-                    if (uart_valid) begin
-                        clear_color_reg[7:0] <= uart_data;
+                    if (rx_valid) begin
+                        clear_color_reg[7:0] <= rx_data;
                         state <= ST_CLEAR_FB_1;
                     end
                 end
 
                 ST_CLEAR_FB_1: begin
                     // Receive high byte of RGB565 color
-                    if (uart_valid) begin
-                        clear_color_reg[15:8] <= uart_data;
+                    if (rx_valid) begin
+                        clear_color_reg[15:8] <= rx_data;
                         state <= ST_DO_CLEAR_FB;
                     end
                 end
@@ -199,13 +287,13 @@ module cmd_parser
 
                 ST_RECV_TRIANGLE: begin
                     // Receive 120 bytes of vertex data
-                    if (uart_valid) begin
+                    if (rx_valid) begin
                         // Shift byte into current field (little-endian)
                         case (field_byte)
-                            2'd0: vertex_fields[field_index][7:0]   <= uart_data;
-                            2'd1: vertex_fields[field_index][15:8]  <= uart_data;
-                            2'd2: vertex_fields[field_index][23:16] <= uart_data;
-                            2'd3: vertex_fields[field_index][31:24] <= uart_data;
+                            2'd0: vertex_fields[field_index][7:0]   <= rx_data;
+                            2'd1: vertex_fields[field_index][15:8]  <= rx_data;
+                            2'd2: vertex_fields[field_index][23:16] <= rx_data;
+                            2'd3: vertex_fields[field_index][31:24] <= rx_data;
                         endcase
 
                         if (field_byte == 2'd3) begin
@@ -225,6 +313,45 @@ module cmd_parser
                     end
                 end
 
+                ST_RECV_TRIANGLE_Q: begin
+                    // Receive 72 bytes of quantized vertex data
+                    if (rx_valid) begin
+                        if (qvtx_byte < 5'd16) begin
+                            // x, y, z, w: S15.16, same as the full format
+                            case (qvtx_byte[1:0])
+                                2'd0: vertex_fields[qvtx_base + 5'(qvtx_byte[3:2])][7:0]   <= rx_data;
+                                2'd1: vertex_fields[qvtx_base + 5'(qvtx_byte[3:2])][15:8]  <= rx_data;
+                                2'd2: vertex_fields[qvtx_base + 5'(qvtx_byte[3:2])][23:16] <= rx_data;
+                                2'd3: vertex_fields[qvtx_base + 5'(qvtx_byte[3:2])][31:24] <= rx_data;
+                            endcase
+                        end else if (qvtx_byte < 5'd20) begin
+                            // u, v: S7.8 -> S15.16 (shift up 8, sign extend)
+                            if (!qvtx_byte[0])
+                                vertex_fields[qvtx_base + 5'd4 + 5'(qvtx_byte[1])][15:0] <= {rx_data, 8'h00};
+                            else
+                                vertex_fields[qvtx_base + 5'd4 + 5'(qvtx_byte[1])][31:16] <= {{8{rx_data[7]}}, rx_data};
+                        end else begin
+                            // r, g, b, a: 0-255 -> S15.16
+                            vertex_fields[qvtx_base + 5'd6 + 5'(qvtx_byte[1:0])] <= unorm8_to_fp(rx_data);
+                        end
+
+                        if (qvtx_byte == 5'(QVERTEX_BYTES - 1)) begin
+                            // Move to next vertex
+                            qvtx_byte <= '0;
+                            qvtx_base <= qvtx_base + 5'd10;
+                        end else begin
+                            qvtx_byte <= qvtx_byte + 1'b1;
+                        end
+
+                        byte_count <= byte_count + 1'b1;
+
+                        // Check if we've received all 72 bytes
+                        if (byte_count == 7'(QTRIANGLE_BYTES - 1)) begin
+                            state <= ST_SUBMIT_TRI;
+                        end
+                    end
+                end
+
                 ST_SUBMIT_TRI: begin
                     // Build vertices from received data
                     v0 <= build_vertex(0);   // Fields 0-9
@@ -248,11 +375,11 @@ module cmd_parser
 
                 ST_RECV_CONFIG: begin
                     // Receive config flags byte
-                    if (uart_valid) begin
-                        tex_enable         <= uart_data[0];
-                        depth_test_enable  <= uart_data[1];
-                        depth_write_enable <= uart_data[2];
-                        blend_enable       <= uart_data[3];
+                    if (rx_valid) begin
+                        tex_enable         <= rx_data[0];
+                        depth_test_enable  <= rx_data[1];
+                        depth_write_enable <= rx_data[2];
+                        blend_enable       <= rx_data[3];
                         state <= ST_IDLE;
                     end
                 end
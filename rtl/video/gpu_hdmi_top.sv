@@ -215,7 +215,7 @@ module gpu_hdmi_top
 
     uart_rx #(
         .CLK_FREQ  (50_000_000),
-        .BAUD_RATE (115200)
+        .BAUD_RATE (921600)
     ) u_uart_rx (
         .clk   (clk_50mhz),
         .rst_n (rst_n),
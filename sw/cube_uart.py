@@ -3,13 +3,19 @@
 Celery3D GPU - UART Cube Animation Driver
 Sends a rotating textured cube to the GPU over UART
 
-Usage: python3 cube_uart.py [serial_port]
-Default: /dev/ttyUSB0
+Usage: python3 cube_uart.py [serial_port] [--baud BAUD] [--quantized]
+Default: /dev/ttyUSB0 at 921600 baud (must match the FPGA UART)
+
+Requires: pyserial, numpy
 """
 
+import argparse
+import numpy as np
 import serial
 import struct
 import math
+import queue
+import threading
 import time
 import sys
 
@@ -17,6 +23,10 @@ import sys
 SCREEN_WIDTH = 64
 SCREEN_HEIGHT = 64
 
+# UART link (must match FPGA; 8N1 framing puts 10 bits on the wire per byte)
+DEFAULT_BAUD = 921600
+UART_BITS_PER_BYTE = 10
+
 # Fixed-point parameters
 FP_FRAC_BITS = 16
 
@@ -25,6 +35,7 @@ CMD_CLEAR_FB = 0x01
 CMD_CLEAR_DEPTH = 0x02
 CMD_TRIANGLE = 0x03
 CMD_SET_CONFIG = 0x04
+CMD_TRIANGLE_Q = 0x05
 
 # Config flags
 CFG_TEX_ENABLE = 0x01
@@ -32,15 +43,21 @@ CFG_DEPTH_TEST = 0x02
 CFG_DEPTH_WRITE = 0x04
 CFG_BLEND_ENABLE = 0x08
 
+# Precompiled wire formats
+_U16 = struct.Struct('<H')
+
 
 # =============================================================================
 # Fixed-point conversion
 # =============================================================================
 
-def float_to_fp(f):
-    """Convert float to S15.16 fixed-point as unsigned 32-bit."""
-    val = int(f * (1 << FP_FRAC_BITS))
-    return val & 0xFFFFFFFF  # Treat as unsigned for packing
+def to_fixed(a, out):
+    """Convert float array to S15.16 fixed-point into little-endian uint32 out."""
+    # Round to int32 through a signed view of out, so each value's int32
+    # bit pattern is stored reinterpreted as uint32
+    np.copyto(out.view('<i4'), np.rint(a * (1 << FP_FRAC_BITS)),
+              casting='unsafe')
+    return out
 
 
 def pack_rgb565(r, g, b):
@@ -55,107 +72,53 @@ def pack_rgb565(r, g, b):
 # 3D Math Library
 # =============================================================================
 
-def mat4_identity():
-    return [
-        [1, 0, 0, 0],
-        [0, 1, 0, 0],
-        [0, 0, 1, 0],
-        [0, 0, 0, 1]
-    ]
-
-
-def mat4_multiply(a, b):
-    result = [[0]*4 for _ in range(4)]
-    for i in range(4):
-        for j in range(4):
-            for k in range(4):
-                result[i][j] += a[i][k] * b[k][j]
-    return result
-
-
-def mat4_transform(m, v):
-    """Transform vec4 by mat4."""
-    return [
-        m[0][0]*v[0] + m[0][1]*v[1] + m[0][2]*v[2] + m[0][3]*v[3],
-        m[1][0]*v[0] + m[1][1]*v[1] + m[1][2]*v[2] + m[1][3]*v[3],
-        m[2][0]*v[0] + m[2][1]*v[1] + m[2][2]*v[2] + m[2][3]*v[3],
-        m[3][0]*v[0] + m[3][1]*v[1] + m[3][2]*v[2] + m[3][3]*v[3],
-    ]
-
-
 def mat4_perspective(fov_y, aspect, near, far):
     tan_half_fov = math.tan(fov_y / 2.0)
-    m = [[0]*4 for _ in range(4)]
-    m[0][0] = 1.0 / (aspect * tan_half_fov)
-    m[1][1] = 1.0 / tan_half_fov
-    m[2][2] = -(far + near) / (far - near)
-    m[2][3] = -(2.0 * far * near) / (far - near)
-    m[3][2] = -1.0
+    m = np.zeros((4, 4))
+    m[0, 0] = 1.0 / (aspect * tan_half_fov)
+    m[1, 1] = 1.0 / tan_half_fov
+    m[2, 2] = -(far + near) / (far - near)
+    m[2, 3] = -(2.0 * far * near) / (far - near)
+    m[3, 2] = -1.0
     return m
 
 
-def vec3_dot(a, b):
-    return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
-
-
-def vec3_sub(a, b):
-    return [a[0]-b[0], a[1]-b[1], a[2]-b[2]]
-
-
-def vec3_cross(a, b):
-    return [
-        a[1]*b[2] - a[2]*b[1],
-        a[2]*b[0] - a[0]*b[2],
-        a[0]*b[1] - a[1]*b[0]
-    ]
-
-
-def vec3_scale(v, s):
-    return [v[0]*s, v[1]*s, v[2]*s]
-
-
-def vec3_length(v):
-    return math.sqrt(vec3_dot(v, v))
-
-
-def vec3_normalize(v):
-    length = vec3_length(v)
-    if length > 0.0001:
-        return vec3_scale(v, 1.0 / length)
-    return v
-
-
 def mat4_look_at(eye, target, up):
-    f = vec3_normalize(vec3_sub(target, eye))
-    r = vec3_normalize(vec3_cross(f, up))
-    u = vec3_cross(r, f)
+    eye = np.asarray(eye, dtype=np.float64)
 
-    m = mat4_identity()
-    m[0][0] = r[0]; m[0][1] = r[1]; m[0][2] = r[2]
-    m[1][0] = u[0]; m[1][1] = u[1]; m[1][2] = u[2]
-    m[2][0] = -f[0]; m[2][1] = -f[1]; m[2][2] = -f[2]
+    f = np.subtract(target, eye)
+    f /= np.linalg.norm(f)
+    r = np.cross(f, up)
+    r /= np.linalg.norm(r)
+    u = np.cross(r, f)
 
-    m[0][3] = -vec3_dot(r, eye)
-    m[1][3] = -vec3_dot(u, eye)
-    m[2][3] = vec3_dot(f, eye)
+    m = np.eye(4)
+    m[0, :3] = r
+    m[1, :3] = u
+    m[2, :3] = -f
+    m[:3, 3] = -m[:3, :3] @ eye
 
     return m
 
 
 def mat4_rotate_x(angle):
-    m = mat4_identity()
     c, s = math.cos(angle), math.sin(angle)
-    m[1][1] = c;  m[1][2] = -s
-    m[2][1] = s;  m[2][2] = c
-    return m
+    return np.array([
+        [1, 0,  0, 0],
+        [0, c, -s, 0],
+        [0, s,  c, 0],
+        [0, 0,  0, 1]
+    ], dtype=np.float64)
 
 
 def mat4_rotate_y(angle):
-    m = mat4_identity()
     c, s = math.cos(angle), math.sin(angle)
-    m[0][0] = c;  m[0][2] = s
-    m[2][0] = -s; m[2][2] = c
-    return m
+    return np.array([
+        [ c, 0, s, 0],
+        [ 0, 1, 0, 0],
+        [-s, 0, c, 0],
+        [ 0, 0, 0, 1]
+    ], dtype=np.float64)
 
 
 # =============================================================================
@@ -208,83 +171,158 @@ CUBE_INDICES = [
     20, 21, 22, 20, 22, 23,  # Left
 ]
 
+# Per-vertex arrays for batched transformation (4 vertices per face)
+POS_H = np.array([[x, y, z, 1.0] for x, y, z in CUBE_POSITIONS], dtype=np.float64)
+VERT_UVS = np.array(CUBE_UVS, dtype=np.float64)
+VERT_COLORS = np.repeat(np.array(FACE_COLORS, dtype=np.float64), 4, axis=0)
+TRI_VERT_INDICES = np.array(CUBE_INDICES, dtype=np.int32).reshape(12, 3)
+
+# Vertex staging arrays: one x, y, z, w, u, v, r, g, b, a row per vertex,
+# as floats and in S15.16 wire format. Only x..w change between frames.
+VERTS = np.zeros((len(POS_H), 10), dtype=np.float64)
+VERTS[:, 4:6] = VERT_UVS
+VERTS[:, 6:9] = VERT_COLORS
+VERTS[:, 9] = 1.0
+
+FP_VERTS = np.zeros((len(POS_H), 10), dtype='<u4')
+to_fixed(VERTS[:, 4:], FP_VERTS[:, 4:])
+
+# Quantized vertices for CMD_TRIANGLE_Q (24 bytes instead of 40): x, y, z, w
+# in S15.16, u, v in S7.8 and r, g, b, a as 0-255. Only x..w change between
+# frames.
+QVERTEX_DTYPE = np.dtype([('xyzw', '<u4', 4), ('uv', '<i2', 2), ('rgba', 'u1', 4)])
+
+Q_VERTS = np.zeros(len(POS_H), dtype=QVERTEX_DTYPE)
+Q_VERTS['uv'] = np.rint(VERTS[:, 4:6] * 256)
+Q_VERTS['rgba'] = np.rint(VERTS[:, 6:10] * 255)
+
+
+# =============================================================================
+# Animation
+# =============================================================================
+
+# Frames per full rotation
+ANIM_FRAMES = 60
+
+# Model matrix for every frame of the loop (rotation around Y and X axes)
+ROT_TABLE = [
+    mat4_rotate_y(angle) @ mat4_rotate_x(angle * 0.7)
+    for angle in (i / ANIM_FRAMES * 2.0 * math.pi for i in range(ANIM_FRAMES))
+]
+
 
 # =============================================================================
 # Vertex Transformation
 # =============================================================================
 
-def transform_vertex(pos, uv, color, mvp):
-    """Transform 3D vertex to screen space."""
+# Viewport transform as a per-column affine map of (x/w, y/w, z/w, 1/w):
+# x to [0, SCREEN_WIDTH], y to [0, SCREEN_HEIGHT] flipped, z to [0, 1], and
+# 1/clip.w scaled up to keep values in a range the fixed-point RTL handles
+# well (it is used for perspective-correct interpolation)
+VIEWPORT_SCALE = np.array([0.5 * SCREEN_WIDTH, -0.5 * SCREEN_HEIGHT, 0.5, 16.0])
+VIEWPORT_BIAS = np.array([0.5 * SCREEN_WIDTH, 0.5 * SCREEN_HEIGHT, 0.5, 0.0])
+
+# Clip-space scratch for build_vertices()
+_CLIP = np.empty((len(POS_H), 4), dtype=np.float64)
+
+
+def build_vertices(mvp, verts, fp):
+    """Transform all cube vertices to screen space and S15.16 wire format.
+
+    Fills the x, y, z, w columns of verts and fp in place. The u, v, r, g,
+    b, a columns are constant and already converted in FP_VERTS.
+    """
     # Transform to clip space
-    clip = mat4_transform(mvp, [pos[0], pos[1], pos[2], 1.0])
+    clip = np.matmul(POS_H, mvp.T, out=_CLIP)
 
-    # Perspective divide
-    inv_w = 1.0 / clip[3]
-    ndc_x = clip[0] * inv_w
-    ndc_y = clip[1] * inv_w
-    ndc_z = clip[2] * inv_w
+    # Perspective divide, leaving 1/clip.w in the last column
+    np.reciprocal(clip[:, 3], out=clip[:, 3])
+    clip[:, :3] *= clip[:, 3:]
 
     # NDC to screen coordinates
-    x = (ndc_x + 1.0) * 0.5 * SCREEN_WIDTH
-    y = (1.0 - ndc_y) * 0.5 * SCREEN_HEIGHT  # Flip Y
-    z = (ndc_z + 1.0) * 0.5  # Map to [0, 1]
+    xyzw = verts[:, :4]
+    np.multiply(clip, VIEWPORT_SCALE, out=xyzw)
+    xyzw += VIEWPORT_BIAS
+
+    to_fixed(xyzw, fp[:, :4])
+    return fp
 
-    # Use 1/clip.w for perspective-correct interpolation
-    # Scale up to keep values in a range the fixed-point RTL handles well
-    w = inv_w * 16.0
 
-    return {
-        'x': x, 'y': y, 'z': z, 'w': w,
-        'u': uv[0], 'v': uv[1],
-        'r': color[0], 'g': color[1], 'b': color[2],
-        'a': 1.0
-    }
+def front_facing(verts):
+    """Return a mask of the triangles in TRI_VERT_INDICES facing the camera."""
+    p = verts[TRI_VERT_INDICES, :2]
+    e1 = p[:, 1] - p[:, 0]
+    e2 = p[:, 2] - p[:, 0]
+    area2 = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+
+    # Faces are wound counter-clockwise, which turns negative once screen Y
+    # is flipped to point down. Zero-area (edge-on) triangles draw nothing.
+    return area2 < 0.0
 
 
 # =============================================================================
 # UART Command Functions
 # =============================================================================
 
-def send_clear_fb(ser, color_rgb565):
-    """Send framebuffer clear command."""
-    ser.write(bytes([CMD_CLEAR_FB]))
-    ser.write(struct.pack('<H', color_rgb565))
+def send_config(ser, flags):
+    """Send configuration command."""
+    ser.write(bytes([CMD_SET_CONFIG, flags]))
 
 
-def send_clear_depth(ser):
-    """Send depth buffer clear command."""
-    ser.write(bytes([CMD_CLEAR_DEPTH]))
+# The per-frame commands are written into a preallocated frame buffer so
+# that a whole frame goes out with a single ser.write(). Each emit_* helper
+# writes at byte offset off and returns the offset just past its command;
+# the triangles after them are filled in through a structured array view.
 
+# Largest frame: clear FB (3) + clear depth (1) + 12 triangles (1 + 3*40)
+FRAME_SIZE = 3 + 1 + 12 * (1 + 3 * 40)
+
+# Frame buffers in flight: one is built while the other drains over the UART
+FRAME_BUFFERS = 2
+
+
+def emit_clear_fb(mv, off, color_rgb565):
+    """Write framebuffer clear command."""
+    mv[off] = CMD_CLEAR_FB
+    _U16.pack_into(mv, off + 1, color_rgb565)
+    return off + 3
+
+
+def emit_clear_depth(mv, off):
+    """Write depth buffer clear command."""
+    mv[off] = CMD_CLEAR_DEPTH
+    return off + 1
 
-def send_config(ser, flags):
-    """Send configuration command."""
-    ser.write(bytes([CMD_SET_CONFIG, flags]))
 
+def triangle_slots(mv, off, cmd, verts):
+    """Map the frame buffer from off as an array of triangle commands.
 
-def send_vertex(ser, v):
-    """Send a single vertex (40 bytes)."""
-    # Pack vertex data as 10 little-endian 32-bit values
-    data = struct.pack('<10I',
-        float_to_fp(v['x']),
-        float_to_fp(v['y']),
-        float_to_fp(v['z']),
-        float_to_fp(v['w']),
-        float_to_fp(v['u']),
-        float_to_fp(v['v']),
-        float_to_fp(v['r']),
-        float_to_fp(v['g']),
-        float_to_fp(v['b']),
-        float_to_fp(v['a'])
-    )
-    ser.write(data)
-
-
-def send_triangle(ser, v0, v1, v2):
-    """Send a triangle command with 3 vertices."""
-    ser.write(bytes([CMD_TRIANGLE]))
-    send_vertex(ser, v0)
-    send_vertex(ser, v1)
-    send_vertex(ser, v2)
+    Each element is the command byte (CMD_TRIANGLE or CMD_TRIANGLE_Q)
+    followed by 3 rows of the matching vertex staging array (FP_VERTS or
+    Q_VERTS), so assigning vertex rows to its 'v' field writes triangles
+    straight into the buffer in wire format.
+    """
+    tri_dtype = np.dtype([('cmd', 'u1'), ('v', verts.dtype, (3,) + verts.shape[1:])])
+    tris = np.frombuffer(mv, dtype=tri_dtype, count=len(TRI_VERT_INDICES), offset=off)
+    tris['cmd'] = cmd
+    return tris
+
+
+def uart_writer(ser, sent_frames, free_frames):
+    """Write queued (frame buffer, size) pairs until a None sentinel arrives.
+
+    A frame buffer is a (memoryview, triangle slots) pair. Runs on its own
+    thread so the next frame is built while this one is on the wire
+    (ser.write() releases the GIL while it blocks). Each buffer is handed
+    back on free_frames once written. If a write fails, the exception is
+    put on free_frames instead, for the main loop to re-raise.
+    """
+    try:
+        for buf, size in iter(sent_frames.get, None):
+            ser.write(buf[0][:size])
+            free_frames.put(buf)
+    except Exception as e:
+        free_frames.put(e)
 
 
 # =============================================================================
@@ -292,23 +330,40 @@ def send_triangle(ser, v0, v1, v2):
 # =============================================================================
 
 def main():
-    # Parse command line for serial port
-    port = sys.argv[1] if len(sys.argv) > 1 else '/dev/ttyUSB0'
+    # Parse command line for serial port and baud rate
+    parser = argparse.ArgumentParser(description="Celery3D GPU - UART Cube Animation")
+    parser.add_argument('port', nargs='?', default='/dev/ttyUSB0',
+                        help="serial port (default: /dev/ttyUSB0)")
+    parser.add_argument('--baud', type=int, default=DEFAULT_BAUD,
+                        help=f"UART baud rate (default: {DEFAULT_BAUD})")
+    parser.add_argument('--quantized', action='store_true',
+                        help="send 24-byte quantized vertices (CMD_TRIANGLE_Q)")
+    args = parser.parse_args()
+    port = args.port
+    baud = args.baud
+
+    # Triangle command and vertex staging array to send from
+    if args.quantized:
+        tri_cmd, tri_verts = CMD_TRIANGLE_Q, Q_VERTS
+    else:
+        tri_cmd, tri_verts = CMD_TRIANGLE, FP_VERTS
 
     print("=" * 50)
     print("Celery3D GPU - UART Cube Animation")
     print("=" * 50)
     print(f"Serial port: {port}")
+    print(f"Baud rate: {baud}")
+    print(f"Vertex format: {'quantized (24 bytes)' if args.quantized else 'full (40 bytes)'}")
     print(f"Resolution: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
     print()
 
     # Open serial port
     try:
-        ser = serial.Serial(port, 115200, timeout=1)
-        print(f"Opened {port} at 115200 baud")
+        ser = serial.Serial(port, baud, timeout=1)
+        print(f"Opened {port} at {baud} baud")
     except serial.SerialException as e:
         print(f"Error opening {port}: {e}")
-        print("\nUsage: python3 cube_uart.py [serial_port]")
+        print("\nUsage: python3 cube_uart.py [serial_port] [--baud BAUD] [--quantized]")
         sys.exit(1)
 
     # Give FPGA time to initialize
@@ -317,6 +372,7 @@ def main():
     # Configure GPU: texture + depth test enabled
     config = CFG_DEPTH_TEST | CFG_DEPTH_WRITE
     send_config(ser, config)
+    ser.flush()
     time.sleep(0.01)
 
     # Setup projection matrix (60 degree FOV)
@@ -329,9 +385,36 @@ def main():
     up = [0, 1, 0]
     view = mat4_look_at(eye, target, up)
 
+    # Camera is fixed, so only the model matrix changes per frame
+    view_proj = proj @ view
+
+    # Wire time per byte plus a small buffer, used to throttle each frame to
+    # its UART time (~19 ms for a full frame at 921600 baud, ~150 ms at
+    # 115200)
+    byte_time = UART_BITS_PER_BYTE / baud * 1.2
+
     # Background color (dark blue)
     bg_color = pack_rgb565(0.1, 0.1, 0.25)
 
+    # Every frame starts by clearing the framebuffer and depth buffer. Those
+    # commands never change, so write them into each frame buffer once,
+    # along with the command byte of every triangle slot after them.
+    free_frames = queue.Queue()
+    for _ in range(FRAME_BUFFERS):
+        mv = memoryview(bytearray(FRAME_SIZE))
+        header_size = emit_clear_fb(mv, 0, bg_color)
+        header_size = emit_clear_depth(mv, header_size)
+        tris = triangle_slots(mv, header_size, tri_cmd, tri_verts)
+        free_frames.put((mv, tris))
+
+    # Frames are sent from a writer thread, overlapping UART output with
+    # building the next frame
+    sent_frames = queue.Queue()
+    writer = threading.Thread(target=uart_writer,
+                              args=(ser, sent_frames, free_frames),
+                              daemon=True)
+    writer.start()
+
     print("Starting animation (Ctrl+C to stop)...")
     print()
 
@@ -340,52 +423,48 @@ def main():
         while True:
             frame_start = time.time()
 
-            # Calculate rotation angle (full rotation over 60 frames)
-            angle = (frame % 60) / 60.0 * 2.0 * math.pi
-
-            # Create model matrix (rotation around Y and X axes)
-            model = mat4_multiply(mat4_rotate_y(angle), mat4_rotate_x(angle * 0.7))
-
-            # Create MVP matrix
-            mv = mat4_multiply(view, model)
-            mvp = mat4_multiply(proj, mv)
-
-            # Clear framebuffer and depth buffer
-            send_clear_fb(ser, bg_color)
-            send_clear_depth(ser)
-
-            # Render the 12 triangles of the cube
-            for i in range(0, 36, 3):
-                face = i // 6
-                color = FACE_COLORS[face]
-
-                i0 = CUBE_INDICES[i]
-                i1 = CUBE_INDICES[i + 1]
-                i2 = CUBE_INDICES[i + 2]
-
-                v0 = transform_vertex(CUBE_POSITIONS[i0], CUBE_UVS[i0], color, mvp)
-                v1 = transform_vertex(CUBE_POSITIONS[i1], CUBE_UVS[i1], color, mvp)
-                v2 = transform_vertex(CUBE_POSITIONS[i2], CUBE_UVS[i2], color, mvp)
-
-                send_triangle(ser, v0, v1, v2)
-
-            # Flush and wait for data to be sent
-            ser.flush()
-
-            # Calculate timing
+            # Create MVP matrix (full rotation over ANIM_FRAMES frames)
+            mvp = view_proj @ ROT_TABLE[frame % ANIM_FRAMES]
+
+            # Transform all 24 vertices at once
+            fp = build_vertices(mvp, VERTS, FP_VERTS)
+            if args.quantized:
+                Q_VERTS['xyzw'] = fp[:, :4]
+
+            # Waits here while both buffers are still queued or on the wire
+            buf = free_frames.get()
+            if isinstance(buf, Exception):
+                raise buf
+            tris = buf[1]
+
+            # Render the camera-facing triangles of the cube after the clear
+            # commands; back faces would be hidden anyway, so don't send them
+            visible = TRI_VERT_INDICES[front_facing(VERTS)]
+            tris['v'][:len(visible)] = tri_verts[visible]
+            size = header_size + len(visible) * tris.itemsize
+
+            # Hand the whole frame to the writer thread. No flush: the frame
+            # drains while the next one is built, and the min_frame_time
+            # throttle below keeps us from getting ahead of the wire.
+            sent_frames.put((buf, size))
+
+            # Calculate timing: how long this frame took to build, and the
+            # actual frame period, which also covers the throttle and waiting
+            # on the UART
             frame_time = time.time() - frame_start
-            fps = 1.0 / frame_time if frame_time > 0 else 0
 
-            # Print status every 10 frames
+            # Print status every 10 frames, averaged since the last one
             if frame % 10 == 0:
-                print(f"Frame {frame:4d} | {fps:.1f} FPS | {frame_time*1000:.1f} ms/frame")
+                if frame > 0:
+                    period = (frame_start - status_start) / 10
+                    print(f"Frame {frame:4d} | {1.0 / period:.1f} FPS | "
+                          f"{period*1000:.1f} ms/frame | build {frame_time*1000:.1f} ms")
+                status_start = frame_start
 
             frame += 1
 
             # Small delay to avoid overwhelming the UART
-            # At 115200 baud, each frame is ~1500 bytes = ~130ms minimum
-            # Add a small buffer
-            min_frame_time = 0.15  # 150ms = ~6.6 FPS max
+            min_frame_time = size * byte_time
             if frame_time < min_frame_time:
                 time.sleep(min_frame_time - frame_time)
 
@@ -393,6 +472,11 @@ def main():
         print("\n\nAnimation stopped.")
         print(f"Total frames: {frame}")
 
+    # Let the writer drain any queued frames, then stop it
+    sent_frames.put(None)
+    writer.join()
+
+    ser.flush()
     ser.close()
     print("Serial port closed.")
 
@@ -14,6 +14,14 @@ CMD_CLEAR_DEPTH = 0x02
 CMD_TRIANGLE = 0x03
 CMD_SET_CONFIG = 0x04
 
+# Command bytes as ready-made 1-byte strings
+_CLEAR_FB_B = bytes([CMD_CLEAR_FB])
+_TRI_B = bytes([CMD_TRIANGLE])
+
+# Precompiled wire formats
+_U16 = struct.Struct('<H')
+_VERTEX_PACKER = struct.Struct('<10i')  # x, y, z, w, u, v, r, g, b, a
+
 def pack_rgb565(r, g, b):
     """Pack float RGB (0-1) to RGB565."""
     ri = int(min(r, 1.0) * 31)
@@ -23,21 +31,21 @@ def pack_rgb565(r, g, b):
 
 def float_to_fp(f):
     """Convert float to S15.16 fixed-point."""
-    val = int(f * 65536)
-    return val & 0xFFFFFFFF
+    # Signed value; _VERTEX_PACKER writes it as a little-endian int32
+    return int(f * 65536)
 
 def main():
     port = sys.argv[1] if len(sys.argv) > 1 else '/dev/ttyUSB0'
 
     print(f"Opening {port}...")
-    ser = serial.Serial(port, 115200, timeout=1)
+    ser = serial.Serial(port, 921600, timeout=1)
     time.sleep(0.5)
 
     print("\n=== Test 1: Clear screen to RED ===")
     color = pack_rgb565(1.0, 0.0, 0.0)  # Bright red
     print(f"Sending CLEAR_FB with color 0x{color:04X}")
-    ser.write(bytes([CMD_CLEAR_FB]))
-    ser.write(struct.pack('<H', color))
+    ser.write(_CLEAR_FB_B)
+    ser.write(_U16.pack(color))
     ser.flush()
     time.sleep(0.5)
     input("Press Enter if screen is RED (or note what you see)...")
@@ -45,8 +53,8 @@ def main():
     print("\n=== Test 2: Clear screen to GREEN ===")
     color = pack_rgb565(0.0, 1.0, 0.0)  # Bright green
     print(f"Sending CLEAR_FB with color 0x{color:04X}")
-    ser.write(bytes([CMD_CLEAR_FB]))
-    ser.write(struct.pack('<H', color))
+    ser.write(_CLEAR_FB_B)
+    ser.write(_U16.pack(color))
     ser.flush()
     time.sleep(0.5)
     input("Press Enter if screen is GREEN...")
@@ -54,8 +62,8 @@ def main():
     print("\n=== Test 3: Clear screen to BLUE ===")
     color = pack_rgb565(0.0, 0.0, 1.0)  # Bright blue
     print(f"Sending CLEAR_FB with color 0x{color:04X}")
-    ser.write(bytes([CMD_CLEAR_FB]))
-    ser.write(struct.pack('<H', color))
+    ser.write(_CLEAR_FB_B)
+    ser.write(_U16.pack(color))
     ser.flush()
     time.sleep(0.5)
     input("Press Enter if screen is BLUE...")
@@ -67,17 +75,17 @@ def main():
 
     # Clear to dark blue
     color = pack_rgb565(0.0, 0.0, 0.2)
-    ser.write(bytes([CMD_CLEAR_FB]))
-    ser.write(struct.pack('<H', color))
+    ser.write(_CLEAR_FB_B)
+    ser.write(_U16.pack(color))
     time.sleep(0.1)
 
     # Send a simple triangle (covers center of 64x64 screen)
     # Vertex format: x, y, z, w, u, v, r, g, b, a (each 4 bytes, little-endian)
     print("Sending triangle...")
-    ser.write(bytes([CMD_TRIANGLE]))
+    ser.write(_TRI_B)
 
     # v0: top center, red
-    ser.write(struct.pack('<10I',
+    ser.write(_VERTEX_PACKER.pack(
         float_to_fp(32.0),  # x
         float_to_fp(10.0),  # y
         float_to_fp(0.5),   # z
@@ -91,7 +99,7 @@ def main():
     ))
 
     # v1: bottom left, green
-    ser.write(struct.pack('<10I',
+    ser.write(_VERTEX_PACKER.pack(
         float_to_fp(10.0),  # x
         float_to_fp(54.0),  # y
         float_to_fp(0.5),   # z
@@ -105,7 +113,7 @@ def main():
     ))
 
     # v2: bottom right, blue
-    ser.write(struct.pack('<10I',
+    ser.write(_VERTEX_PACKER.pack(
         float_to_fp(54.0),  # x
         float_to_fp(54.0),  # y
         float_to_fp(0.5),   # z